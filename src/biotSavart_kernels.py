@@ -0,0 +1,182 @@
+# Import dependencies
+import os
+import numpy as np
+from numba import njit, prange, get_num_threads
+
+# Ahead-of-time compiled kernels, built with `python -m src.biotSavart_kernels`.
+# The extension is optional, the JIT kernels are used when it is missing.
+try:
+    import src.biotSavart_aot as _aot
+except ImportError:
+    _aot = None
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def biot_savart(P, mid, dl, out):
+    """
+    Computes the magnetic field at the observation points P due to a set of coils
+    using the Biot-Savart Law. The subtraction, cross product, |R|^-3 and the
+    reduction over segments are fused in a single pass, parallelized over the
+    observation points.
+
+    All the arrays must share the same dtype (float32 or float64), a version of the
+    kernel is compiled and cached for each of them. The per-segment arithmetic and
+    the partial sums of each coil are computed in that dtype, so the float32 version
+    runs on twice as many SIMD lanes; the total over the coils is carried in double
+    precision.
+
+    Parameters:
+        P (np.ndarray): Observation points (shape: (m, 3)).
+        mid (np.ndarray): Midpoints of the coil segments (shape: (num_coils, num_segments, 3)).
+        dl (np.ndarray): Differential length elements of the coil segments, scaled by the proportionality
+            constant of their coil (N * mu_0 * I / 4pi) (shape: (num_coils, num_segments, 3)).
+        out (np.ndarray): Output array for the magnetic field (shape: (m, 3)).
+
+    Returns:
+        np.ndarray: The `out` array filled with the magnetic field at each point.
+    """
+    num_coils = mid.shape[0]
+    num_segments = mid.shape[1]
+    # Constants in the dtype of the arrays, so float32 inputs are not promoted to float64
+    zero = P.dtype.type(0.0)
+    one = P.dtype.type(1.0)
+    tiny = P.dtype.type(1e-18)
+    for m in prange(P.shape[0]):
+        px = P[m, 0]
+        py = P[m, 1]
+        pz = P[m, 2]
+        bx = 0.0
+        by = 0.0
+        bz = 0.0
+        for i in range(num_coils):
+            # Partial sums of each coil, added to the total once per coil (two-level summation)
+            cbx = zero
+            cby = zero
+            cbz = zero
+            for s in range(num_segments):
+                # Displacement vector from the segment to the observation point
+                rx = px - mid[i, s, 0]
+                ry = py - mid[i, s, 1]
+                rz = pz - mid[i, s, 2]
+                # Cross product dl x R
+                cx = dl[i, s, 1] * rz - dl[i, s, 2] * ry
+                cy = dl[i, s, 2] * rx - dl[i, s, 0] * rz
+                cz = dl[i, s, 0] * ry - dl[i, s, 1] * rx
+                # |R|^-3 with a single square root (no pow), avoiding division by zero
+                # for points lying on the wire. It is cubed from 1/|R| (at most 1e27), not
+                # taken from r2^3, which underflows to 0 in float32 for the clamped r2
+                r2 = max(rx * rx + ry * ry + rz * rz, tiny)
+                inv_r = one / np.sqrt(r2)
+                inv_r3 = inv_r * inv_r * inv_r
+                cbx += cx * inv_r3
+                cby += cy * inv_r3
+                cbz += cz * inv_r3
+            bx += cbx
+            by += cby
+            bz += cbz
+        out[m, 0] = bx
+        out[m, 1] = by
+        out[m, 2] = bz
+    return out
+
+
+def _aot_kernel(dtype):
+    """
+    Returns the ahead-of-time compiled kernel for the given dtype, or None if the JIT kernel
+    must be used. The AOT build is serial (numba.pycc does not support `parallel=True`), so it
+    is only used when the kernel runs on a single thread, as in the optimizer worker processes,
+    where it avoids compiling or loading the JIT kernel in every process.
+    """
+    if _aot is None or get_num_threads() > 1:
+        return None
+    return getattr(_aot, f"biot_savart_{np.dtype(dtype).name}", None)
+
+
+def compute_field(P, mid, dl, out):
+    """
+    Runs the Biot-Savart kernel (see `biot_savart`), using the ahead-of-time compiled version
+    when it is available and the kernel runs on a single thread.
+    """
+    kernel = _aot_kernel(P.dtype) or biot_savart
+    return kernel(P, mid, dl, out)
+
+
+_compiled = set()
+_float32_checked = False
+
+
+def check_float32(rtol=1e-5):
+    """
+    Validates the float32 kernel against the float64 one on a square loop of unit side,
+    observed at its center, at points off its plane and at the midpoint of one of its
+    segments (a point lying on the wire).
+
+    Parameters:
+        rtol (float): Maximum error of the float32 field, relative to the largest float64 field.
+
+    Returns:
+        float: The relative error of the float32 field.
+
+    Raises:
+        RuntimeError: If the float32 field is not finite or its relative error exceeds `rtol`.
+    """
+    corners = np.array([[0, .5, .5], [0, -.5, .5], [0, -.5, -.5], [0, .5, -.5], [0, .5, .5]])
+    loop = np.linspace(corners[:-1], corners[1:], 10, endpoint=False, axis=1).reshape(-1, 3)
+    loop = np.vstack((loop, loop[:1]))
+    dl = np.diff(loop, axis=0)[None]
+    mid = 0.5 * (loop[:-1] + loop[1:])[None]
+    P = np.vstack(([[0, 0, 0], [.3, .1, -.2], [-.2, .4, .6]], mid[0, 3]))
+
+    B = {}
+    for dtype in (np.float64, np.float32):
+        args = [np.ascontiguousarray(a, dtype=dtype) for a in (P, mid, dl)]
+        B[dtype] = compute_field(*args, np.empty((P.shape[0], 3), dtype=dtype))
+
+    err = np.max(np.abs(B[np.float32] - B[np.float64])) / np.max(np.abs(B[np.float64]))
+    if not np.all(np.isfinite(B[np.float32])) or err > rtol:
+        raise RuntimeError(f"The float32 Biot-Savart kernel does not match the float64 one "
+                           f"(relative error {err:.2e}, field {B[np.float32].tolist()})")
+    return err
+
+
+def warm_up(dtype=np.float64):
+    """
+    Triggers the JIT compilation of the kernels for the given dtype with a tiny
+    problem so that the compilation time is not accounted in the first simulation batch.
+    The float32 kernel is validated against the float64 one the first time (see `check_float32`).
+
+    Parameters:
+        dtype (np.dtype): Floating point type of the arrays, np.float64 (default) or np.float32.
+    """
+    global _float32_checked
+    dtype = np.dtype(dtype)
+    if dtype not in _compiled and _aot_kernel(dtype) is None:
+        P = np.ones((1, 3), dtype=dtype)
+        segments = np.zeros((1, 1, 3), dtype=dtype)
+        biot_savart(P, segments, segments, np.empty((1, 3), dtype=dtype))
+        _compiled.add(dtype)
+    if dtype == np.float32 and not _float32_checked:
+        check_float32()
+        _float32_checked = True
+
+
+def build_aot(output_dir=None):
+    """
+    Compiles the ahead-of-time version of the kernels (float32 and float64) into the
+    `biotSavart_aot` extension module.
+
+    Parameters:
+        output_dir (str, optional): Directory of the extension, by default the directory of this module.
+    """
+    from numba.pycc import CC
+
+    cc = CC('biotSavart_aot')
+    cc.output_dir = output_dir or os.path.dirname(os.path.abspath(__file__))
+    for dtype in ('float32', 'float64'):
+        signature = "{0}[:, ::1]({0}[:, ::1], {0}[:, :, ::1], {0}[:, :, ::1], {0}[:, ::1])".format(dtype)
+        cc.export(f'biot_savart_{dtype}', signature)(biot_savart.py_func)
+    cc.compile()
+
+
+if __name__ == "__main__":
+    build_aot()
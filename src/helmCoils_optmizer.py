@@ -1,6 +1,10 @@
+import os
 import numpy as np
-import random
-from deap import base, creator, tools, algorithms
+from collections import OrderedDict
+from functools import lru_cache
+import multiprocessing
+from numba import set_num_threads
+from deap import base, creator, tools
 import src.helmCoils_simulator as sim
 import src.plotMagneticField as hplot
 
@@ -47,6 +51,133 @@ awg_data = {
 # Source: Sears and Zemansky's University Physics, Vol. 2, Table 25.1.
 RHO = 1.72e-8  # ohm-meters
 
+# DEAP types shared by the optimizers, created once when the module is loaded
+# (guarded in case another module already created them)
+if not hasattr(creator, "FitnessMin"):
+    creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+if not hasattr(creator, "Individual"):
+    creator.create("Individual", list, fitness=creator.FitnessMin)
+
+class _LRUCache:
+    """
+    Bounded cache that discards the least recently used entries, counting its hits and misses.
+
+    Attributes:
+        maxsize (int): Maximum number of entries.
+        hits (int): Number of lookups that found their key.
+        misses (int): Number of lookups that did not find their key.
+    """
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        if key in self._data:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+        self.misses += 1
+        return default
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+# Optimizer evaluated by the worker processes of the fitness evaluation pool
+_worker_optimizer = None
+
+def _init_worker(optimizer):
+    """
+    Initializes a worker process of the fitness evaluation pool.
+
+    Args:
+        optimizer: The optimizer whose fitness function is evaluated by the worker.
+
+    Notes:
+        - The Biot-Savart kernel is limited to one thread, the parallelism comes from the pool.
+    """
+    global _worker_optimizer
+    _worker_optimizer = optimizer
+    set_num_threads(1)
+
+def _evaluate_worker(individual):
+    """
+    Evaluates the fitness of an individual in a worker process of the pool.
+    """
+    return _worker_optimizer.toolbox.evaluate(individual)
+
+def ea_simple(population, toolbox, cxpb, mutpb, ngen, rng, stats=None, halloffame=None, verbose=True):
+    """
+    Simple evolutionary algorithm, equivalent to `deap.algorithms.eaSimple`, where the
+    random numbers of each generation are drawn in batches from a NumPy generator.
+
+    Args:
+        population (list): Initial population of individuals.
+        toolbox: DEAP toolbox with the `evaluate`, `mate`, `select` and `map` operators, and a
+            `mutate_population` operator `(offspring, mutpb)` mutating the whole offspring at once.
+        cxpb (float): Probability of mating two consecutive offspring.
+        mutpb (float): Probability of mutating an offspring.
+        ngen (int): Number of generations.
+        rng (np.random.Generator): Random number generator.
+        stats (tools.Statistics, optional): Statistics compiled on each generation.
+        halloffame (tools.HallOfFame, optional): Hall of fame updated on each generation.
+        verbose (bool): If True, prints the logbook of each generation.
+
+    Returns:
+        tuple: The final population and the logbook of the evolution.
+    """
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+
+    def evaluate(individuals):
+        invalid_ind = [ind for ind in individuals if not ind.fitness.valid]
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+        return len(invalid_ind)
+
+    def log(gen, nevals):
+        if halloffame is not None:
+            halloffame.update(population)
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=gen, nevals=nevals, **record)
+        if verbose:
+            print(logbook.stream)
+
+    log(0, evaluate(population))
+
+    for gen in range(1, ngen + 1):
+        # Select and clone the next generation individuals
+        offspring = [toolbox.clone(ind) for ind in toolbox.select(population, len(population))]
+
+        # Mate the consecutive pairs of offspring
+        mate = rng.random(len(offspring) // 2) < cxpb
+        for i in np.flatnonzero(mate):
+            ind1, ind2 = offspring[2 * i], offspring[2 * i + 1]
+            offspring[2 * i], offspring[2 * i + 1] = toolbox.mate(ind1, ind2)
+            del offspring[2 * i].fitness.values, offspring[2 * i + 1].fitness.values
+
+        # Mutate the whole offspring with a single draw of random numbers
+        toolbox.mutate_population(offspring, mutpb)
+
+        nevals = evaluate(offspring)
+        population[:] = offspring
+        log(gen, nevals)
+
+    return population, logbook
+
+@lru_cache(maxsize=4096)
 def resistance_coil(awg_size, N, L):
     """
     Calculate the resistance of a coil made from a given AWG wire size.
@@ -66,6 +197,7 @@ def resistance_coil(awg_size, N, L):
         - The resistivity of copper (RHO) is assumed to be 1.72e-8 ohm-meters.
         - The length of the wire is calculated as L * N, assuming L as the perimeter of the coil.
         - The cross-sectional area of the wire is converted from mm² to m² for unit consistency.
+        - The results are memoized, the optimizers evaluate it with the same arguments many times.
     """
     info = awg_data.get(awg_size)
     if info is None:
@@ -84,23 +216,13 @@ def calculate_loop_length(coordinates):
     Returns:
         list: List with the lengths of each loop
     """
-    num_loops = coordinates.shape[0]
-    lengths = []
-    
-    for i in range(num_loops):
-        # Get coordinates of loop i
-        x, y, z = coordinates[i]
-        
-        # Compute differences between consecutive points
-        dx = np.diff(x)
-        dy = np.diff(y)
-        dz = np.diff(z)
-        
-        # Compute Euclidean distance between consecutive points and sum them
-        length = np.sum(np.sqrt(dx**2 + dy**2 + dz**2))
-        lengths.append(length)
-        
-    return lengths
+    # Differences between consecutive points of all the loops at once (shape: (coil_number, 3, N-1))
+    d = np.diff(np.asarray(coordinates, dtype=float), axis=2)
+
+    # Euclidean distance between consecutive points from the squared norms, summed per loop
+    lengths = np.sqrt(np.einsum('cks,cks->cs', d, d)).sum(axis=1)
+
+    return lengths.tolist()
 
 def select_awg(current, awg_data):
     """
@@ -153,7 +275,7 @@ def get_slope(coil, spires):
         coil.update_parameters(turns=1, current=I)
         # Run the coil simulation in parallel
         results = sim.coil_simulation_parallel(
-            X, Y, Z, coil, spires, batch_size = 120, enable_progress_bar=False, n=150
+            X, Y, Z, coil, spires, batch_size = 120, enable_progress_bar=False
         )
         # Store the current (I) and the corresponding B_x value at the first point
         data.append([I, results['Bx'][0]])
@@ -223,6 +345,9 @@ class Source_optimizer:
         self.min_I = 0.001
         self.min_N = 1
 
+        # Random number generator of the genetic algorithm
+        self.rng = np.random.default_rng()
+
         # Initialize a cache to store fitness evaluations for efficiency
         self.fitness_cache = {}
 
@@ -230,12 +355,7 @@ class Source_optimizer:
         self._setup_deap()
 
     def _setup_deap(self):
-        # Create DEAP types if not already created.
-        if not hasattr(creator, "FitnessMin"):
-            creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
-        if not hasattr(creator, "Individual"):
-            creator.create("Individual", list, fitness=creator.FitnessMin)
-
+        # The toolbox is built per instance, its operators are bound to the optimizer
         self.toolbox = base.Toolbox()
 
         # Register genetic operators
@@ -243,12 +363,12 @@ class Source_optimizer:
         self.toolbox.register("population", tools.initRepeat, list, self.toolbox.individual)
         self.toolbox.register("evaluate", lambda ind: self.fitness_function(ind)) #lambda used to add new parameters
         self.toolbox.register("mate", self.long_jump_crossover)
-        self.toolbox.register("mutate", self.mutate_individual, mu=0, sigma=0.1, indpb=0.4)
+        self.toolbox.register("mutate_population", self.mutate_population, mu=0, sigma=0.1, indpb=0.4)
         self.toolbox.register("select", tools.selTournament, tournsize=3)
 
         # Register attribute generators
-        self.toolbox.register("attr_I", random.uniform, self.min_I, self.max_I)
-        self.toolbox.register("attr_N", random.uniform, self.min_N, self.max_N)
+        self.toolbox.register("attr_I", self.rng.uniform, self.min_I, self.max_I)
+        self.toolbox.register("attr_N", self.rng.uniform, self.min_N, self.max_N)
 
     def apply_constraints(self, individual):
         individual[0] = round(max(self.min_I, min(self.max_I, individual[0])), 2)
@@ -257,8 +377,8 @@ class Source_optimizer:
 
     def init_individual(self):
         # Wider range for initialization
-        initial_I = random.uniform(self.min_I * 0.5, self.max_I * 1.5)  # Extends beyond normal range
-        initial_N = random.uniform(self.min_N * 0.5, self.max_N * 1.5)  # Allows more extreme values
+        initial_I = self.rng.uniform(self.min_I * 0.5, self.max_I * 1.5)  # Extends beyond normal range
+        initial_N = self.rng.uniform(self.min_N * 0.5, self.max_N * 1.5)  # Allows more extreme values
 
         # Ensure the values stay within constraints
         ind = creator.Individual([initial_I, initial_N])
@@ -342,31 +462,55 @@ class Source_optimizer:
         return result
 
     def mutate_individual(self, individual, mu, sigma, indpb):
-        if random.random() < indpb:
-            individual[0] += random.gauss(mu, sigma)
-        if random.random() < indpb:
-            individual[1] += random.gauss(mu, sigma)
+        if self.rng.random() < indpb:
+            individual[0] += self.rng.normal(mu, sigma)
+        if self.rng.random() < indpb:
+            individual[1] += self.rng.normal(mu, sigma)
         return self.apply_constraints(individual),
 
+    def mutate_population(self, population, mutpb, mu, sigma, indpb):
+        """
+        Batched version of `mutate_individual`: mutates each individual of the population with
+        probability `mutpb`, drawing the noise of all the individuals in a single call.
+
+        Args:
+            population (list): Individuals to mutate in place.
+            mutpb (float): Probability of mutating an individual.
+            mu (float): Mean of the gaussian noise.
+            sigma (float): Standard deviation of the gaussian noise.
+            indpb (float): Probability of mutating each gene of a mutated individual.
+        """
+        n = len(population)
+        genes = np.array(population, dtype=float).reshape(n, 2)
+        mutated = self.rng.random(n) < mutpb
+        noise = self.rng.normal(mu, sigma, size=(n, 2))
+        mask = mutated[:, None] & (self.rng.random((n, 2)) < indpb)
+        genes = np.where(mask, genes + noise, genes)
+
+        for i in np.flatnonzero(mutated):
+            population[i][:] = genes[i].tolist()
+            self.apply_constraints(population[i])
+            del population[i].fitness.values
+
     def adaptive_mutate(self, individual, gen, mu):
         """Mutación adaptativa con mayor exploración al inicio."""
         mutation_rate = 0.5 * (1 - gen / self.gen)
         sigma = 0.2 * (1 - gen / self.gen)
         
-        if random.random() < mutation_rate:
-            individual[0] += random.gauss(mu, sigma)
+        if self.rng.random() < mutation_rate:
+            individual[0] += self.rng.normal(mu, sigma)
 
-        if random.random() < mutation_rate:
-            individual[1] += random.gauss(mu, sigma)
+        if self.rng.random() < mutation_rate:
+            individual[1] += self.rng.normal(mu, sigma)
 
         return self.apply_constraints(individual),
 
     def mate_individual(self, ind1, ind2): 
         'With 50% of probability generates individuals'
         if not self.fix_L:
-            if random.random() < 0.5:
+            if self.rng.random() < 0.5:
                 ind1[0], ind2[0] = ind2[0], ind1[0]
-        if random.random() < 0.5:
+        if self.rng.random() < 0.5:
             ind1[1], ind2[1] = ind2[1], ind1[1]
         self.apply_constraints(ind1)
         self.apply_constraints(ind2)
@@ -376,19 +520,19 @@ class Source_optimizer:
         """Cruce con exploración agresiva con mejor probabilidad de mezcla."""
         
         # Swapping genes with 25% probability
-        if random.random() < 0.25:
+        if self.rng.random() < 0.25:
             ind1[0], ind2[0] = ind2[0], ind1[0]
-        if random.random() < 0.25:
+        if self.rng.random() < 0.25:
             ind1[1], ind2[1] = ind2[1], ind1[1]
 
         # Blended crossover with 50% probability
-        if random.random() < 0.5:
-            alpha = random.uniform(-0.5, 1.5)
+        if self.rng.random() < 0.5:
+            alpha = self.rng.uniform(-0.5, 1.5)
             ind1[0] = alpha * ind1[0] + (1 - alpha) * ind2[0]
             ind2[0] = alpha * ind2[0] + (1 - alpha) * ind1[0]
         
-        if random.random() < 0.5:
-            alpha = random.uniform(-0.5, 1.5)
+        if self.rng.random() < 0.5:
+            alpha = self.rng.uniform(-0.5, 1.5)
             ind1[1] = alpha * ind1[1] + (1 - alpha) * ind2[1]
             ind2[1] = alpha * ind2[1] + (1 - alpha) * ind1[1]
 
@@ -419,8 +563,8 @@ class Source_optimizer:
         stats.register("min", np.min)
         stats.register("avg", np.mean)
 
-        pop, logbook = algorithms.eaSimple(pop, self.toolbox, cxpb=cxpb, mutpb=mutpb,
-                                        ngen=ngen, stats=stats, halloffame=hof, verbose=True)
+        pop, logbook = ea_simple(pop, self.toolbox, cxpb=cxpb, mutpb=mutpb, ngen=ngen,
+                                   rng=self.rng, stats=stats, halloffame=hof, verbose=True)
         return hof[0], logbook
 
 
@@ -446,7 +590,8 @@ class HelmholtzOptimizer:
         """
         Parameters:
           desired_size: base size parameter for coil dimensions.
-          spires_function: function to generate coil geometry.
+          fun: function to generate coil geometry, e.g. coil.square_spires or the specialized
+               coil.make_square_generator(100), which is cheaper to call repeatedly.
           N: Number of turns.
           I: Current.
           fix_L: Boolean flag; if True, L will remain fixed.
@@ -472,35 +617,32 @@ class HelmholtzOptimizer:
             self.min_L, self.max_L = self.desired_size, self.desired_size * 4
             self.min_d, self.max_d = self.desired_size, self.desired_size * coil.coils_number
 
-        # A local cache for fitness evaluations
-        self.fitness_cache = {}
+        # Random number generator of the genetic algorithm
+        self.rng = np.random.default_rng()
+
+        # A local bounded cache for fitness evaluations, keyed on the (L, d) values in centimeters
+        self.fitness_cache = _LRUCache(maxsize=10000)
 
         # Set up DEAP toolbox.
         self._setup_deap()
 
     def _setup_deap(self):
-        # Create DEAP types if not already created.
-        if not hasattr(creator, "FitnessMin"):
-            creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
-        if not hasattr(creator, "Individual"):
-            creator.create("Individual", list, fitness=creator.FitnessMin)
-
+        # The toolbox is built per instance, its operators are bound to the optimizer
         self.toolbox = base.Toolbox()
 
         # Register genetic operators
         self.toolbox.register("individual", tools.initIterate, creator.Individual, self.init_individual)
         self.toolbox.register("population", tools.initRepeat, list, self.toolbox.individual)
-        self.toolbox.register("evaluate", lambda ind: self.fitness_function(ind,batch_Size = 120, num_seg=100)) #lambda used to add new parameters
+        self.toolbox.register("evaluate", self.fitness_function, batch_Size = 120, num_seg=100)
         #self.toolbox.register("mate", self.mate_individual)  #Combine genes of two generations
         self.toolbox.register("mate", self.long_jump_crossover)
-        self.toolbox.register("mutate", self.mutate_individual, mu=0, sigma=0.1, indpb=0.4)
-        #self.toolbox.register("mutate", self.adaptive_mutate, mu=0, sigma=0.1, indpb=0.4)
+        self.toolbox.register("mutate_population", self.mutate_population, mu=0, sigma=0.1, indpb=0.4)
         self.toolbox.register("select", tools.selTournament, tournsize=3)
 
 
         # Register attribute generators
-        self.toolbox.register("attr_L", random.uniform, self.min_L, self.max_L)
-        self.toolbox.register("attr_d", random.uniform, self.min_d, self.max_d)
+        self.toolbox.register("attr_L", self.rng.uniform, self.min_L, self.max_L)
+        self.toolbox.register("attr_d", self.rng.uniform, self.min_d, self.max_d)
 
     def apply_constraints(self, individual):
         # If fix_L is True, force L to the fixed value.
@@ -513,58 +655,92 @@ class HelmholtzOptimizer:
 
     def init_individual(self):
         # Wider range for initialization
-        initial_L = random.uniform(self.min_L * 0.5, self.max_L * 1.5)  # Extends beyond normal range
-        initial_d = random.uniform(self.min_d * 0.5, self.max_d * 1.5)  # Allows more extreme values
+        initial_L = self.rng.uniform(self.min_L * 0.5, self.max_L * 1.5)  # Extends beyond normal range
+        initial_d = self.rng.uniform(self.min_d * 0.5, self.max_d * 1.5)  # Allows more extreme values
 
         # Ensure the values stay within constraints
         ind = creator.Individual([initial_L, initial_d])
         return self.apply_constraints(ind)
 
 
+    def __getstate__(self):
+        # The toolbox can not be pickled, it is rebuilt on the worker processes
+        state = self.__dict__.copy()
+        del state['toolbox']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup_deap()
+
+    def _parallel_map(self, pool, func, individuals):
+        """
+        Map registered in the DEAP toolbox to evaluate the individuals in the worker pool.
+
+        Only the individuals that are not already in `fitness_cache` are sent to the pool,
+        where they are evaluated with the worker copy of `toolbox.evaluate` (`func`).
+        The results are stored in the cache of this process.
+        """
+        individuals = list(individuals)
+        keys = [self._cache_key(ind) for ind in individuals]
+        fitnesses = [self.fitness_cache.get(key) for key in keys]
+
+        # One evaluation per distinct missing key
+        pending = {key: tuple(ind) for key, ind, fitness in zip(keys, individuals, fitnesses) if fitness is None}
+        computed = dict(zip(pending, pool.map(_evaluate_worker, list(pending.values()))))
+        for key, fitness in computed.items():
+            self.fitness_cache[key] = fitness
+
+        return [computed[key] if fitness is None else fitness for key, fitness in zip(keys, fitnesses)]
+
+    @staticmethod
+    def _cache_key(individual):
+        """
+        Key of an individual in `fitness_cache`: its (L, d) values in centimeters as integers,
+        the granularity of `apply_constraints`.
+        """
+        L, d = individual
+        return round(L * 100), round(d * 100)
+
     def fitness_function(self, individual, grid_length_size = 0.01, batch_Size = 120, *args, **kwargs):
         L, d = individual
-        key = (L, d)
-        if key in self.fitness_cache:
-            return self.fitness_cache[key]
+        key = self._cache_key(individual)
+        cached = self.fitness_cache.get(key)
+        if cached is not None:
+            return cached
 
         coil = self.coil
         # Update the coil parameters
-        coil.update_parameters(length=L, distance=d)
+        coil.update(length=L, height=d)
 
         spires = self.fun(*args, **kwargs)
 
         X, Y, Z = sim.generate_range([-1*(np.sum(coil.h)/2), 0], step_size_x = grid_length_size)
 
         coil_Results = sim.coil_simulation_parallel(
-            X, Y, Z, coil, spires, batch_Size, enable_progress_bar=False
+            X, Y, Z, coil, spires, batch_Size, enable_progress_bar=False, as_dataframe=False
         )
+        X, Y, Z, Bx = coil_Results['X'], coil_Results['Y'], coil_Results['Z'], coil_Results['Bx']
 
         #hplot.plot_mainAxis_field(coil_Results, index='Bx')
 
-        target = coil_Results[(coil_Results['X'] == 0) & (coil_Results['Y'] == 0) & (coil_Results['Z'] == 0)]
-        if target.empty:
-            target_point = coil_Results['Bx'].mean()
+        on_axis = (Y == 0) & (Z == 0)
+        target = Bx[on_axis & (X == 0)]
+        if target.size == 0:
+            target_point = Bx.mean()
         else:
-            target_point = target['Bx'].values[0]
+            target_point = target[0]
         tolerance = 0.001 * target_point if target_point != 0 else 0.001
         lower_bound_tol, upper_bound_tol = target_point - tolerance, target_point + tolerance
 
-        filtered_points = coil_Results[
-            (coil_Results['Bx'] >= lower_bound_tol) & (coil_Results['Bx'] <= upper_bound_tol)
-        ].sort_values(by='X')
+        Xs = np.sort(X[on_axis & (Bx >= lower_bound_tol) & (Bx <= upper_bound_tol)])
 
-        if len(filtered_points) > 1:
-            is_contiguous = all(
-                (filtered_points['X'].iloc[i + 1] - filtered_points['X'].iloc[i]) <= 2 * self.grid_length_size
-                for i in range(len(filtered_points) - 1)
-            )
-        else:
-            is_contiguous = False
+        is_contiguous = Xs.size > 1 and np.all(np.diff(Xs) <= 2 * self.grid_length_size)
 
         if not is_contiguous:
             result = (5000,)  # Penalty value
         else:
-            a = abs(filtered_points['X'].max() - filtered_points['X'].min())
+            a = abs(Xs[-1] - Xs[0])
             result = (self.desired_size / 2 - a,)
 
         self.fitness_cache[key] = result
@@ -572,32 +748,58 @@ class HelmholtzOptimizer:
 
     def mutate_individual(self, individual, mu, sigma, indpb):
         if not self.fix_L:
-            if random.random() < indpb:
-                individual[0] += random.gauss(mu, sigma)
-        if random.random() < indpb:
-            individual[1] += random.gauss(mu, sigma)
+            if self.rng.random() < indpb:
+                individual[0] += self.rng.normal(mu, sigma)
+        if self.rng.random() < indpb:
+            individual[1] += self.rng.normal(mu, sigma)
         return self.apply_constraints(individual),
 
+    def mutate_population(self, population, mutpb, mu, sigma, indpb):
+        """
+        Batched version of `mutate_individual`: mutates each individual of the population with
+        probability `mutpb`, drawing the noise of all the individuals in a single call.
+
+        Args:
+            population (list): Individuals to mutate in place.
+            mutpb (float): Probability of mutating an individual.
+            mu (float): Mean of the gaussian noise.
+            sigma (float): Standard deviation of the gaussian noise.
+            indpb (float): Probability of mutating each gene of a mutated individual.
+        """
+        n = len(population)
+        genes = np.array(population, dtype=float).reshape(n, 2)
+        mutated = self.rng.random(n) < mutpb
+        noise = self.rng.normal(mu, sigma, size=(n, 2))
+        mask = mutated[:, None] & (self.rng.random((n, 2)) < indpb)
+        if self.fix_L:
+            mask[:, 0] = False
+        genes = np.where(mask, genes + noise, genes)
+
+        for i in np.flatnonzero(mutated):
+            population[i][:] = genes[i].tolist()
+            self.apply_constraints(population[i])
+            del population[i].fitness.values
+
     def adaptive_mutate(self, individual, gen, mu):
         """Mutación adaptativa con mayor exploración al inicio."""
         mutation_rate = 0.5 * (1 - gen / self.gen)
         sigma = 0.2 * (1 - gen / self.gen)
         
         if not self.fix_L:
-            if random.random() < mutation_rate:
-                individual[0] += random.gauss(mu, sigma)
+            if self.rng.random() < mutation_rate:
+                individual[0] += self.rng.normal(mu, sigma)
 
-        if random.random() < mutation_rate:
-            individual[1] += random.gauss(mu, sigma)
+        if self.rng.random() < mutation_rate:
+            individual[1] += self.rng.normal(mu, sigma)
 
         return self.apply_constraints(individual),
 
     def mate_individual(self, ind1, ind2): 
         'With 50% of probability generates individuals'
         if not self.fix_L:
-            if random.random() < 0.5:
+            if self.rng.random() < 0.5:
                 ind1[0], ind2[0] = ind2[0], ind1[0]
-        if random.random() < 0.5:
+        if self.rng.random() < 0.5:
             ind1[1], ind2[1] = ind2[1], ind1[1]
         self.apply_constraints(ind1)
         self.apply_constraints(ind2)
@@ -605,7 +807,7 @@ class HelmholtzOptimizer:
 
     def long_jump_crossover(self, ind1, ind2):
         """Cruce con exploración agresiva."""
-        alpha = random.uniform(-0.5, 1.5)
+        alpha = self.rng.uniform(-0.5, 1.5)
 
         if not self.fix_L:
             ind1[0], ind2[0] = ind2[0], ind1[0]
@@ -615,7 +817,22 @@ class HelmholtzOptimizer:
         self.apply_constraints(ind2)
         return ind1, ind2
     
-    def run_ga(self, pop_size=None, cxpb=0.5, mutpb=None, ngen=None, initial_individual=None):
+    def run_ga(self, pop_size=None, cxpb=0.5, mutpb=None, ngen=None, initial_individual=None, processes=1):
+        """
+        Runs the genetic algorithm.
+
+        Parameters:
+          pop_size, cxpb, mutpb, ngen: Population size, crossover and mutation probabilities and
+               number of generations (by default the values given to the constructor).
+          initial_individual: Optional [L, d] individual added to the initial population.
+          processes: Number of processes evaluating the individuals. 1 (default) evaluates them
+               in this process; any other value (None for one per CPU) uses a pool of spawned
+               worker processes. The pool re-imports the main module in every worker, so a script
+               using it must call the optimizer under an `if __name__ == "__main__":` guard.
+
+        Returns:
+          tuple: The best individual found and the logbook of the run.
+        """
         if pop_size is None:
             pop_size = self.pop
         if ngen is None:
@@ -637,15 +854,36 @@ class HelmholtzOptimizer:
         stats.register("min", np.min)
         stats.register("avg", np.mean)
 
-        pop, logbook = algorithms.eaSimple(pop, self.toolbox, cxpb=cxpb, mutpb=mutpb,
-                                        ngen=ngen, stats=stats, halloffame=hof, verbose=True)
+        if processes == 1:
+            # Evaluate the individuals in this process with the default map of the toolbox
+            pop, logbook = ea_simple(pop, self.toolbox, cxpb=cxpb, mutpb=mutpb, ngen=ngen,
+                                     rng=self.rng, stats=stats, halloffame=hof, verbose=True)
+            return hof[0], logbook
+
+        # Evaluate the individuals of each generation in a pool of processes. The workers are
+        # spawned, forking a process that already started the kernel threads is not safe.
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(processes=processes or os.cpu_count(), initializer=_init_worker,
+                          initargs=(self,)) as pool:
+            self.toolbox.register("map", self._parallel_map, pool)
+            try:
+                pop, logbook = ea_simple(pop, self.toolbox, cxpb=cxpb, mutpb=mutpb, ngen=ngen,
+                                           rng=self.rng, stats=stats, halloffame=hof, verbose=True)
+            finally:
+                # Restore the default map of the toolbox for the runs in this process
+                self.toolbox.register("map", map)
+            pool.close()
+            pool.join()
         return hof[0], logbook
 
 
-    def optimize(self):
-        best_solution, logbook = self.run_ga(initial_individual=[1.05, 0.59])
+    def optimize(self, processes=1):
+        # processes > 1 (or None) evaluates the individuals in worker processes, see `run_ga`
+        best_solution, logbook = self.run_ga(initial_individual=[1.05, 0.59], processes=processes)
         L_opt, d_opt = best_solution
         print("\nOptimal Parameters Found:")
         print(f"L (length): {L_opt:.4f} m")
         print(f"d (spacing): {d_opt:.4f} m")
+        print(f"Fitness cache: {self.fitness_cache.hits} hits, {self.fitness_cache.misses} misses "
+              f"({self.fitness_cache.hit_rate():.1%} hit rate)")
         return L_opt, d_opt
\ No newline at end of file
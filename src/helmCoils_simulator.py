@@ -1,13 +1,21 @@
 # Import dependencies
 import numpy as np
 import pandas as pd
-from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
 from typing import Union
 import src.plotMagneticField as hplot
+import src.biotSavart_kernels as bsk
+
+# CuPy is optional, it is only required by the 'gpu' backend
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
 
 # Define global constants
 MU_0 = 4 * np.pi * 1e-7  # Permeability of free space
+TILE_PAIRS = 2 ** 14  # (point, segment) pairs per block of the NumPy backend, sized so its temporaries fit in L2
+GPU_TILE_PAIRS = 2 ** 22  # (point, segment) pairs per block of the GPU backend, a few hundred MB of device memory
 rotz_180 = np.array([
     [-1, 0, 0],
     [0, -1, 0],
@@ -17,7 +25,7 @@ rotz_180 = np.array([
 class CoilParameters:
     def __init__(self, coils_number: int, length: Union[float, list, np.ndarray], 
                  distance: Union[float, list, np.ndarray], turns: Union[int, list, np.ndarray], 
-                 current: float, rot_matrix: np.ndarray):
+                 current: float, rot_matrix: np.ndarray, dtype: np.dtype = np.float64):
         """
         Initialize Helmholtz coil parameters.
 
@@ -28,6 +36,8 @@ class CoilParameters:
             turns (int | list | np.ndarray): Number of turns in each coil.
             current (float): Electric current applied to the coils.
             rot_matrix (np.ndarray): Rotation matrix for coordinate transformation.
+            dtype (np.dtype, optional): Floating point type of the spires and of the field computation,
+                np.float64 (default) or np.float32, which halves the memory traffic of the kernels.
         """
         # Convert inputs to NumPy arrays
         self.L = np.atleast_1d(length)  
@@ -35,6 +45,7 @@ class CoilParameters:
         self.N = np.atleast_1d(turns) if isinstance(turns, (list, np.ndarray)) else np.array([turns])  
         self.I = current
         self.A = rot_matrix
+        self.dtype = np.dtype(dtype)
 
         # Other parameters
         self.coils_number = coils_number
@@ -63,7 +74,8 @@ class CoilParameters:
         # Validate `rot_matrix`
         if self.A.shape != (3, 3):
             raise ValueError(f"Invalid rotation matrix shape. Expected (3,3), got {self.A.shape}")
-        
+        self._A_rotz = self.A @ rotz_180  # Combined transformation of the polygonal and star coils
+
         self.a = self.L / 2  # Half Helmholtz testbed length side
         self.pos =  self.get_spires_position()
 
@@ -113,11 +125,36 @@ class CoilParameters:
 
         if rot_matrix is not None:
             self.A = rot_matrix
+            self._A_rotz = self.A @ rotz_180
 
         # Recalculate the coil positions after parameter update
         self.a = self.L / 2  # Half Helmholtz testbed length side
         self.pos = self.get_spires_position()
 
+    def update(self, length: Union[float, list, np.ndarray] = None,
+               height: Union[float, list, np.ndarray] = None):
+        """
+        Lightweight update of the side length(s) and the distance(s) between coils, the only
+        parameters changed by the geometry optimizer. Scalars are broadcast to every coil and
+        only `a` and `pos` are recomputed; use `update_parameters` for any other change.
+
+        Args:
+            length (float | list | np.ndarray, optional): New length(s) for the coils.
+            height (float | list | np.ndarray, optional): New distance(s) between the coils.
+
+        Returns:
+            CoilParameters: The updated coil parameters.
+        """
+        # np.full raises a ValueError if the sizes can not be broadcast to the number of coils
+        if length is not None:
+            self.L = np.full(self.coils_number, length, dtype=float)
+        if height is not None and self.coils_number > 1:
+            self.h = np.full(self.coils_number - 1, height, dtype=float)
+
+        self.a = self.L / 2
+        self.pos = self.get_spires_position()
+        return self
+
 
     def get_spires_position(self):
         """
@@ -127,38 +164,14 @@ class CoilParameters:
             np.ndarray: Array with computed positions.
         """
         coils_number = self.coils_number  # Number of coils
-        h = self.h  # Heights between coils
-
-        # Initialize arrays with NaN values
-        d = np.full(coils_number, np.nan)   # Temporary array for displacement values
-        d1 = np.full(coils_number, np.nan)  # Final array for cumulative positions
-
-        o = coils_number // 2  # Compute middle index (integer division)
-
-        # Compute displacement values for each coil except the last one
-        if self.coils_number == 1:
-            d1 = [0]
-        else:
-            for j in range(coils_number - 1):
-                if j < o - (coils_number % 2 == 0):  
-                    # For coils before the middle point
-                    d[j] = -h[j]  
-                elif j == o - (coils_number % 2 == 0):  
-                    # Middle coil case: If even, split height; if odd, set zero
-                    d[j] = -h[j] / 2 if coils_number % 2 == 0 else 0
-                    d[j + 1] = h[j] / 2 if coils_number % 2 == 0 else h[j]
-                else:
-                    # For coils after the middle point
-                    d[j + 1] = h[j]              
-
-            # Compute cumulative positions
-            for j in range(coils_number):
-                if j <= o - (coils_number % 2 == 0):  
-                    # Sum displacements from current position to the middle point
-                    d1[j] = np.sum(d[j:o - (coils_number % 2 == 0) + 1]) 
-                else:
-                    # Sum displacements from the middle point onward
-                    d1[j] = np.sum(d[o - (coils_number % 2 == 0) + 1:j + 1]) 
+        h = np.asarray(self.h, dtype=float)[:coils_number - 1]  # Heights between coils
+
+        # Position of each coil measured from the first one
+        z = np.concatenate(([0.0], np.cumsum(h)))
+
+        # Center the coils on the middle point: the middle coil if the number of coils is odd, the
+        # midpoint of the two central coils if it is even (both indices are equal when odd)
+        d1 = z - (z[(coils_number - 1) // 2] + z[coils_number // 2]) / 2
 
         return d1  # Return computed coil positions
 
@@ -171,40 +184,58 @@ class CoilParameters:
         b (float, optional): Half the vertical side length (along the Z-axis). If not provided, b = a (square).t
 
         Returns:
-            list: List of arrays, each representing a coil shape (4, 3, num_seg).
+            np.ndarray: Coordinates of the coils (shape: (coils_number, 3, 4 * num_seg)).
         """
         # Use `b = a` if not provided
         b = np.atleast_1d(b) if b is not None else self.a
 
-        spires = []
-
-        for i in range(self.coils_number):
-            L0_half = self.a[i]
-            L1_half = b[i]
-
-            # Generate evenly spaced points for the y and z coordinates along the square sides
-            y_coords = np.linspace(L0_half, -L0_half, num_seg)
-            z_coords = np.linspace(-L1_half, L1_half, num_seg)
-
-            # Define the 3D coordinates of the four sides of a square coil
-            spire = np.array([
-                [np.zeros(num_seg), y_coords, L1_half * np.ones(num_seg)],   # Top edge
-                [np.zeros(num_seg), -L0_half * np.ones(num_seg), -z_coords], # Right edge
-                [np.zeros(num_seg), -y_coords, -L1_half * np.ones(num_seg)], # Bottom edge
-                [np.zeros(num_seg), L0_half * np.ones(num_seg), z_coords]    # Left edge
-            ])
-
-            displacement = np.array([self.pos[i], 0, 0]).reshape(3, 1)
-
-            # Transform the coordinates of the second coil using the matrix A and apply the displacement
-            spire = np.einsum('ij,ljk->lik', self.A, spire - displacement[None,: , :])
-            spires.append(spire)
-            
-        spires = np.array(spires)
-        spires = spires.transpose(0, 2, 1, 3).reshape(self.coils_number, 3, -1)
+        # Half side lengths of each coil, broadcast over the sides and points
+        L0_half = np.asarray(self.a, dtype=float).reshape(-1, 1)
+        L1_half = np.asarray(b, dtype=float).reshape(-1, 1)
+
+        # Displacement of each coil along the X axis (shape: (coils_number, 3))
+        displacement = np.zeros((self.coils_number, 3))
+        displacement[:, 0] = self.pos
+
+        # Parameter running along each side, from +1 to -1
+        t = np.linspace(1, -1, num_seg)
+
+        # The four sides of all the coils in a single buffer, one (x, y, z) record per point
+        # (shape: (coils_number, 4, num_seg, 3)), centered on the origin
+        sides = np.empty((self.coils_number, 4, num_seg, 3))
+        sides[..., 0] = 0.0
+        sides[:, 0, :, 1] = L0_half * t     # Top edge
+        sides[:, 0, :, 2] = L1_half
+        sides[:, 1, :, 1] = -L0_half        # Right edge
+        sides[:, 1, :, 2] = L1_half * t
+        sides[:, 2, :, 1] = -L0_half * t    # Bottom edge
+        sides[:, 2, :, 2] = -L1_half
+        sides[:, 3, :, 1] = L0_half         # Left edge
+        sides[:, 3, :, 2] = -L1_half * t
+
+        # Transform the coordinates of all the coils using the matrix A at once, then displace them;
+        # A(sides - displacement) = A sides - A displacement, which only adds a (coils_number, 3) offset
+        spires = np.einsum('ij,clsj->clsi', self.A, sides) - (displacement @ self.A.T)[:, None, None, :]
+        spires = spires.astype(self.dtype, copy=False)
+
+        # Coordinates on axis 1 and the points of the four sides on axis 2
+        spires = spires.reshape(self.coils_number, -1, 3).transpose(0, 2, 1)
 
         return spires
 
+    def make_square_generator(self, num_seg):
+        """
+        Returns a generator of square coils specialized for a fixed number of segments, for
+        repeated calls with changing lengths and distances (e.g. as the `fun` of the optimizers).
+
+        Parameters:
+            num_seg (int): Number of segments per side.
+
+        Returns:
+            SquareSpiresGenerator: Callable returning the same coordinates as `square_spires(num_seg)`.
+        """
+        return SquareSpiresGenerator(self, num_seg)
+
     def circular_spires(self, num_seg):
         """
         Generates coordinates of multiple circular coils (spirals) in 3D space.
@@ -215,7 +246,8 @@ class CoilParameters:
         Returns:
             np.ndarray: Array of shape (num_coils, 3, 4*num_seg) containing the coils.
         """
-        spires = []
+        # Buffer de salida con un registro (x, y, z) por punto, forma (num_coils, 4*num_seg, 3)
+        spires = np.empty((self.coils_number, 4 * num_seg, 3), dtype=self.dtype)
 
         for i in range(self.coils_number):
             r = self.L[i] / 2  # Radio del círculo
@@ -228,17 +260,16 @@ class CoilParameters:
             y_coords = r * np.sin(theta_vals)  
             z_coords = r * np.cos(theta_vals)  
 
-            # Formar la matriz de coordenadas con forma (3, 4*num_seg)
-            spire = np.array([x_coords, y_coords, z_coords])
-
-            displacement = np.array([self.pos[i], 0, 0]).reshape(3, 1)
+            # Formar la matriz de coordenadas con un registro (x, y, z) por punto, forma (4*num_seg, 3)
+            spire = np.stack([x_coords, y_coords, z_coords], axis=-1)
 
-            # Aplicar transformación con matriz A y desplazar
-            spire = np.einsum('ij,jk->ik', self.A, spire - displacement)
+            displacement = np.array([self.pos[i], 0, 0])
 
-            spires.append(spire)
+            # Aplicar transformación con matriz A y desplazar (A @ displacement es un vector de 3 elementos)
+            spires[i] = np.einsum('ij,sj->si', self.A, spire) - self.A @ displacement
 
-        return np.array(spires)  # Devuelve un array con forma (num_coils, 3, 4*num_seg)
+        # Devuelve un array con forma (num_coils, 3, 4*num_seg), vista de los registros (num_coils, 4*num_seg, 3)
+        return spires.transpose(0, 2, 1)
 
     
     def polygonal_spires(self, num_seg, n=5):
@@ -255,7 +286,8 @@ class CoilParameters:
         total_num_seg = n * num_seg  # Ensure all sides have an equal number of points
         angles = np.linspace(0, 2 * np.pi, n, endpoint=False)  # Polygon vertex angles
 
-        spires = []
+        # Output buffer, one (x, y, z) record per point (shape: (num_coils, total_num_seg, 3))
+        spires = np.empty((self.coils_number, total_num_seg, 3), dtype=self.dtype)
 
         for coil_idx in range(self.coils_number):
             r = self.L[coil_idx] / 2
@@ -266,24 +298,20 @@ class CoilParameters:
             y_closed = np.append(y_vertices, y_vertices[0])
             z_closed = np.append(z_vertices, z_vertices[0])
 
-            # Generate all edges continuously
-            all_edges = []
-            for j in range(n):
-                y_edge = np.linspace(y_closed[j], y_closed[j+1], num_seg)
-                z_edge = np.linspace(z_closed[j], z_closed[j+1], num_seg)
-                x_edge = np.zeros(num_seg)
-                all_edges.append(np.vstack((x_edge, y_edge, z_edge)))  # Shape (3, num_seg)
-
-            spire = np.hstack(all_edges)  # Final shape (3, total_num_seg)
+            # Generate all edges continuously into a single buffer (shape: (total_num_seg, 3)), every
+            # edge interpolated at once between consecutive vertices (shape: (n, num_seg) per coordinate)
+            spire = np.empty((total_num_seg, 3))
+            spire[:, 0] = 0.0
+            spire[:, 1] = np.linspace(y_closed[:-1], y_closed[1:], num_seg, axis=1).ravel()
+            spire[:, 2] = np.linspace(z_closed[:-1], z_closed[1:], num_seg, axis=1).ravel()
 
-            displacement = np.array([self.pos[coil_idx], 0, 0]).reshape(3, 1)
+            displacement = np.array([self.pos[coil_idx], 0, 0])
 
-            # Apply transformation
-            spire = np.einsum('ij,jk->ik', np.dot(self.A, rotz_180), spire - displacement)
+            # Apply transformation, then displace the coil by the transformed displacement
+            spires[coil_idx] = np.einsum('ij,sj->si', self._A_rotz, spire) - self._A_rotz @ displacement
 
-            spires.append(spire)
-
-        return np.array(spires)  # Shape: (num_coils, 3, total_num_seg)
+        # Shape: (num_coils, 3, total_num_seg), a view of the (num_coils, total_num_seg, 3) records
+        return spires.transpose(0, 2, 1)
 
 
     def star_spires(self, num_seg, star_points=6):
@@ -310,8 +338,9 @@ class CoilParameters:
         
         # Generate angles for each vertex
         angles = np.linspace(0, 2*np.pi, total_vertices, endpoint=False)
-        
-        spires = []
+
+        # Output buffer, one (x, y, z) record per point (shape: (num_coils, total_points, 3))
+        spires = np.empty((self.coils_number, total_vertices * seg_per_edge, 3), dtype=self.dtype)
 
         for coil_idx in range(self.coils_number): 
             r = self.L[coil_idx] / 2
@@ -328,35 +357,151 @@ class CoilParameters:
             y_closed = np.append(y_vertices, y_vertices[0])
             z_closed = np.append(z_vertices, z_vertices[0])
         
-            # Generate edges by interpolating between consecutive vertices
-            star_edges = []
-            for i in range(total_vertices):
-                # Linearly interpolate between the current and next vertex
-                y_edge = np.linspace(y_closed[i], y_closed[i+1], seg_per_edge)
-                z_edge = np.linspace(z_closed[i], z_closed[i+1], seg_per_edge)
-                x_edge = np.zeros(seg_per_edge)  # X-coordinate is h/2 for the first spire
-            
-                # Stack coordinates into (seg_per_edge, 3) array and add to the list
-                edge_coords = np.vstack((x_edge, y_edge, z_edge)).T
-                star_edges.append(edge_coords)
-        
-            # Convert list of edges to a numpy array (shape: [3, total_vertices*seg_per_edge])
-            star_edges = np.array(star_edges)
-            sides = star_edges.reshape(-1, 3).T
-        
-            # Compute coordinates for the second spire (shifted by -h along x-axis before transformation)
-            displacement = np.array([self.pos[coil_idx], 0, 0]).reshape(3, 1)
-            spire = np.einsum('ij,jk->ik', np.dot(self.A, rotz_180), sides - displacement)
-            spires.append(spire)
-        spires = np.array(spires)
+            # Generate edges by interpolating between consecutive vertices, directly into a
+            # single buffer (shape: [total_vertices*seg_per_edge, 3])
+            sides = np.empty((total_vertices * seg_per_edge, 3))
+            sides[:, 0] = 0.0
+            # Linearly interpolate all the edges at once, between every vertex and the next one
+            sides[:, 1] = np.linspace(y_closed[:-1], y_closed[1:], seg_per_edge, axis=1).ravel()
+            sides[:, 2] = np.linspace(z_closed[:-1], z_closed[1:], seg_per_edge, axis=1).ravel()
+
+            # Shift by -pos along x-axis before transformation, applied as the transformed displacement
+            displacement = np.array([self.pos[coil_idx], 0, 0])
+            spires[coil_idx] = np.einsum('ij,sj->si', self._A_rotz, sides) - self._A_rotz @ displacement
+
+        # Shape (num_coils, 3, total_points), a view of the (num_coils, total_points, 3) records
+        spires = spires.transpose(0, 2, 1)
         return spires
 
+    def precompute_segments(self, spires, dtype=None):
+        """
+        Computes the segments of the coils once, after their spires are generated, so the
+        Biot-Savart kernels do not redo the differences for every observation point.
+
+        Parameters:
+            spires (np.ndarray): 3D coordinates of the coils (shape: (num_coils, 3, num_points)).
+            dtype (np.dtype, optional): Floating point type of the segments (np.float64 or np.float32),
+                by default the dtype of the coil.
+
+        Returns:
+            tuple: (dl, mid) of shape (num_coils, num_points - 1, 3), dl being scaled by the
+                proportionality constant of each coil (N * mu_0 * I / 4pi).
+        """
+        A1 = (np.asarray(self.N, dtype=float) * MU_0 * self.I) / (4 * np.pi)
+        return _precompute_segments(spires, A1, self.dtype if dtype is None else dtype)
 
     def __repr__(self):
         return (f"CoilParameters(coils_number={self.coils_number}, L={self.L}, h={self.h}, "
                 f"N={self.N}, I={self.I}, A_shape={self.A.shape})")
 
 
+class SquareSpiresGenerator:
+    """
+    Square coil generator specialized for a coil and a fixed number of segments, built by
+    `CoilParameters.make_square_generator`.
+
+    The shape of the sides and the rotation matrix are folded once into a (4, num_seg, 3)
+    template, the transformed sides of a unit square. Every call only scales it by the current
+    half lengths of the coils and subtracts the transformed displacements, without building and
+    transforming the sides again. The template is rebuilt if the rotation matrix of the coil
+    is replaced.
+    """
+    def __init__(self, coil, num_seg):
+        self.coil = coil
+        self.num_seg = num_seg
+        self._build_templates()
+
+    def _build_templates(self):
+        A = self.coil.A
+        t = np.linspace(1, -1, self.num_seg)  # Parameter running along each side, from +1 to -1
+        ones = np.ones(self.num_seg)
+
+        # Unit Y and Z coordinates of the top, right, bottom and left edges (shape: (4, num_seg))
+        uy = np.stack((t, -ones, -t, ones))
+        uz = np.stack((ones, t, -ones, -t))
+
+        # A (0, uy, uz) for every point (shape: (4, num_seg, 3))
+        self._A = A
+        self._unit = uy[..., None] * A[:, 1] + uz[..., None] * A[:, 2]
+
+    def __call__(self, num_seg=None, b=None):
+        """
+        Generates the coordinates of the coils for their current parameters.
+
+        Parameters:
+            num_seg (int, optional): Number of segments per side; only the specialized value is
+                accepted, any other value (or a `b`) falls back to `CoilParameters.square_spires`.
+            b (float, optional): Half the vertical side length, see `CoilParameters.square_spires`.
+
+        Returns:
+            np.ndarray: Coordinates of the coils (shape: (coils_number, 3, 4 * num_seg)).
+        """
+        coil = self.coil
+        if (num_seg is not None and num_seg != self.num_seg) or b is not None:
+            return coil.square_spires(self.num_seg if num_seg is None else num_seg, b)
+        if coil.A is not self._A:
+            self._build_templates()
+
+        a = np.asarray(coil.a, dtype=float).reshape(-1, 1, 1, 1)
+        offset = np.asarray(coil.pos, dtype=float).reshape(-1, 1, 1, 1) * coil.A[:, 0]
+
+        # A (0, a uy, a uz) - A (pos, 0, 0) for all the coils at once (shape: (coils_number, 4, num_seg, 3))
+        spires = a * self._unit
+        spires -= offset
+        spires = spires.astype(coil.dtype, copy=False)
+        return spires.reshape(coil.coils_number, -1, 3).transpose(0, 2, 1)
+
+
+def _axis_values(value_range, step_size):
+    """
+    Generates the sorted values of one axis with a given step size. The grid starts at
+    the lower limit (its values are multiples of the step size if the lower limit is one),
+    the upper limit is added at the end when it is not on the grid, and 0 is always part
+    of the values.
+
+    Parameters:
+        value_range (tuple): (min, max) values of the axis.
+        step_size (float): Step size between consecutive values.
+
+    Returns:
+        numpy.ndarray: Sorted unique values including the critical points (min, 0 and max).
+    """
+    lower, upper = value_range
+    tol = 1e-9 * step_size
+
+    # Anchor of the grid: 0 if the lower limit is a multiple of the step size, the lower limit otherwise
+    k_lower = lower / step_size
+    anchor = 0.0 if abs(k_lower - np.round(k_lower)) <= 1e-9 else lower
+
+    # Values of the grid lying inside the range, the first one being the lower limit
+    k_min = np.ceil((lower - anchor) / step_size - 1e-9)
+    k_max = np.floor((upper - anchor) / step_size + 1e-9)
+    values = anchor + np.arange(k_min, k_max + 1) * step_size
+    if values.size == 0:
+        return np.unique([lower, 0.0, upper])
+    values[0] = lower
+
+    # Make the upper limit part of the values (a single value if the range is degenerate)
+    if upper - values[-1] > tol:
+        values = np.append(values, upper)
+    else:
+        values[-1] = upper
+
+    # Make 0 part of the values, at the ends if it is outside the range
+    if lower > 0:
+        return np.concatenate(([0.0], values))
+    if upper < 0:
+        return np.concatenate((values, [0.0]))
+    i = np.searchsorted(values, 0.0)
+    if i < values.size and values[i] <= tol:
+        values[i] = 0.0
+    elif i > 0 and -values[i - 1] <= tol:
+        values[i - 1] = 0.0
+    else:
+        values = np.insert(values, i, 0.0)
+    return values
+
+
 def generate_range(x_range, y_range=None, z_range=None, step_size_x=0.1, step_size_y=None, step_size_z=None):
     """
     Generates a sorted NumPy array of values covering the given ranges with a specified step size.
@@ -382,123 +527,183 @@ def generate_range(x_range, y_range=None, z_range=None, step_size_x=0.1, step_si
     if step_size_z is None:
         step_size_z = step_size_x
 
-    # Generate values from -2*a to 2*a with a step size of step_size
-    range_vals_x = np.arange(x_range[0], x_range[1] + step_size_x, step_size_x)
-    range_vals_y = np.arange(y_range[0], y_range[1] + step_size_y, step_size_y)
-    range_vals_z = np.arange(z_range[0], z_range[1] + step_size_z, step_size_z)
-    
-    # Ensure critical points (-2*a, 0, and 2*a) are included in the range
-    critical_vals_x = np.array([x_range[0], 0, x_range[1]])
-    critical_vals_y = np.array([y_range[0], 0, y_range[1]])
-    critical_vals_z = np.array([z_range[0], 0, z_range[1]])
-    range_vals_x = np.unique(np.concatenate((range_vals_x, critical_vals_x)))
-    range_vals_y = np.unique(np.concatenate((range_vals_y, critical_vals_y)))
-    range_vals_z = np.unique(np.concatenate((range_vals_z, critical_vals_z)))
-    
-    # Create a meshgrid for the XY, YZ, and XZ planes
-    X, Y = np.meshgrid(range_vals_x, range_vals_y)
-    
-    # Points in the XY plane (Z = 0)
-    X_xy, Y_xy = X.flatten(), Y.flatten()
-    Z_xy = np.zeros_like(X_xy)
-    
-    # Points in the YZ plane (X = 0)
-    Y, Z = np.meshgrid(range_vals_y, range_vals_z)    
-    Y_yz, Z_yz = Y.flatten(), Z.flatten()
-    X_yz = np.zeros_like(Y_yz)
-    
-    # Points in the XZ plane (Y = 0)
-    X, Z = np.meshgrid(range_vals_x, range_vals_z)    
-    X_xz, Z_xz = X.flatten(), Z.flatten()
-    Y_xz = np.zeros_like(X_xz)
-    
-    # Concatenate all points
-    X_total = np.concatenate([X_xy, X_yz, X_xz])
-    Y_total = np.concatenate([Y_xy, Y_yz, Y_xz])
-    Z_total = np.concatenate([Z_xy, Z_yz, Z_xz])
+    # Generate values from -2*a to 2*a with a step size of step_size, including the critical points
+    range_vals_x = _axis_values(x_range, step_size_x)
+    range_vals_y = _axis_values(y_range, step_size_y)
+    range_vals_z = _axis_values(z_range, step_size_z)
     
-    # Combine coordinates into a single array of shape (N, 3)
-    points = np.column_stack((X_total, Y_total, Z_total))
-    
-    # Remove duplicate points
-    unique_points = np.unique(points, axis=0)
-    
-    # Split the unique points back into X, Y, Z
-    X_unique, Y_unique, Z_unique = unique_points[:, 0], unique_points[:, 1], unique_points[:, 2]
+    # The union of the XY, YZ and XZ planes is built directly in lexicographic (X, Y, Z) order,
+    # without duplicates, instead of sorting the concatenated planes. The values of every
+    # axis are sorted and include 0, so the planes only share the points lying on the axes
+    nx, ny, nz = range_vals_x.size, range_vals_y.size, range_vals_z.size
+    ix = np.searchsorted(range_vals_x, 0.0)  # Index of 0 in each axis
+    iy = np.searchsorted(range_vals_y, 0.0)
+
+    # Points with X != 0: the XY plane line (Z = 0) with the XZ plane line (Y = 0) inserted at Y = 0
+    line_y = np.concatenate((range_vals_y[:iy], np.zeros(nz), range_vals_y[iy + 1:]))
+    line_z = np.concatenate((np.zeros(iy), range_vals_z, np.zeros(ny - iy - 1)))
+    m = line_y.size
+
+    # Lines of the points with X < 0, the whole YZ plane at X = 0 (it contains the points
+    # of the other planes at X = 0) and the lines of the points with X > 0
+    X_unique = np.concatenate((np.repeat(range_vals_x[:ix], m), np.zeros(ny * nz),
+                               np.repeat(range_vals_x[ix + 1:], m)))
+    Y_unique = np.concatenate((np.tile(line_y, ix), np.repeat(range_vals_y, nz),
+                               np.tile(line_y, nx - ix - 1)))
+    Z_unique = np.concatenate((np.tile(line_z, ix), np.tile(range_vals_z, ny),
+                               np.tile(line_z, nx - ix - 1)))
     
     return X_unique, Y_unique, Z_unique
 
 
+def _precompute_segments(spires, A1, dtype=np.float64):
+    """
+    Computes the differential length elements (dl) and the midpoints of the segments of each coil.
+
+    The proportionality constant of each coil is folded into its dl, so the Biot-Savart
+    kernels do not have to multiply it per segment and per observation point.
+
+    Parameters:
+        spires (np.ndarray): 3D coordinates of the coils (shape: (num_coils, 3, num_points)).
+        A1 (np.ndarray): Proportionality constant of each coil (N * mu_0 * I / 4pi) (shape: (num_coils,)).
+        dtype (np.dtype): Floating point type of the segments (np.float64 or np.float32).
+
+    Returns:
+        tuple: (dl, mid), both C-contiguous of shape (num_coils, num_points - 1, 3), dl being scaled by A1.
+            The (x, y, z) components of each segment are contiguous in memory.
+    """
+    spires = np.asarray(spires, dtype=float).transpose(0, 2, 1)  # Shape: (num_coils, num_points, 3)
+    dl = np.diff(spires, axis=1) * np.asarray(A1, dtype=float).reshape(-1, 1, 1)
+    mid = 0.5 * (spires[:, :-1] + spires[:, 1:])
+    return np.ascontiguousarray(dl, dtype=dtype), np.ascontiguousarray(mid, dtype=dtype)
+
+
 def calculate_field(args):
     """
-    Calculates the magnetic field at a given point due to a current-carrying coil.
-    
+    Calculates the magnetic field at a set of points due to a set of current-carrying coils.
+
+    All the observation points and all the segments of all the coils are evaluated at
+    once, each segment being represented by its midpoint and its differential length
+    element (dl).
+
     Parameters:
         args (tuple): A tuple containing:
-            A1 (float): Proportionality constant for the magnetic field (e.g., permeability times current).
-            P (numpy.ndarray): The point in 3D space where the magnetic field is calculated (shape: (3,)).
-            side (numpy.ndarray): 3D coordinates of the coil segments (shape: (3, num_points)).
-    
+            P (numpy.ndarray): The points in 3D space where the magnetic field is calculated (shape: (m, 3)).
+            dl (numpy.ndarray): Differential length elements of the segments, scaled by the proportionality
+                constant of their coil (shape: (num_coils, num_segments, 3)).
+            mid (numpy.ndarray): Midpoints of the segments (shape: (num_coils, num_segments, 3)).
+
     Returns:
-        numpy.ndarray: The magnetic field vector (shape: (3,)).
+        numpy.ndarray: The magnetic field vectors (shape: (m, 3)). CuPy arrays are computed
+            on the GPU and return a CuPy array.
     """
-    A1, P, side = args   
-    # Compute the differential length elements (dl) for all segments at once
-    dl = np.diff(side, axis=1)  # Shape: (3, num_segments)
-    try:
-        # Compute the displacement vectors (R) from each segment to the observation point
-        R = P[:, np.newaxis] - side[:, :-1]  # Shape: (3, num_segments)
-        # Compute the Euclidean norm of R (distance from segment to point)
-        norm_R = np.linalg.norm(R, axis=0)  # Shape: (num_segments,)
-        # Avoid division by zero by adding a small epsilon where norm_R is too small
-        norm_R = np.where(norm_R < 1e-9, 1e-9, norm_R)
-        # Compute dB using vectorized cross-product and division
-        dB = (A1[:-1] * np.cross(dl, R, axis=0)) / (norm_R**3)  # Shape: (3, num_segments)
-        # Sum over all segments to get the total field
-        B = np.sum(dB, axis=1)  # Shape: (3,)
-    except Exception as e:
-        print("Error: ", e)
-        raise
+    P, dl, mid = args
+    xp = cp.get_array_module(P) if cp is not None else np
+
+    # Displacement vectors (R) from each segment to each observation point
+    R = P[:, None, None, :] - mid[None, ...]  # Shape: (m, num_coils, num_segments, 3)
+    R0, R1, R2 = R[..., 0], R[..., 1], R[..., 2]
+    dl0, dl1, dl2 = dl[..., 0], dl[..., 1], dl[..., 2]
+
+    # Cross product dl x R written by components into a single buffer (avoids np.cross overhead),
+    # the components on the first axis so each one is contiguous (shape: (3, m, num_coils, num_segments))
+    cross = xp.empty((3,) + R0.shape, dtype=R.dtype)
+    cross[0] = dl1 * R2 - dl2 * R1
+    cross[1] = dl2 * R0 - dl0 * R2
+    cross[2] = dl0 * R1 - dl1 * R0
+
+    # |R|^3 from the squared norm of R (r2 * sqrt(r2) avoids a generic power), avoiding
+    # division by zero for points lying on the wire
+    r2 = xp.maximum(xp.einsum('mcsi,mcsi->mcs', R, R), 1e-18)
+
+    # |R|^-3 computed once (a single division per segment) and applied to the three components
+    inv_r3 = r2 * xp.sqrt(r2)
+    xp.reciprocal(inv_r3, out=inv_r3)
+    cross *= inv_r3
+
+    # Sum over all segments of all coils to get the total field at each point. The reduced
+    # axis is the contiguous last one, so NumPy applies its pairwise summation
+    B = cross.reshape(3, P.shape[0], -1).sum(axis=2).T
     return B
 
 
-def magnetic_field_coil_parallel(P, N_arr, I, coils, n):
+def _check_backend(backend):
+    """
+    Validates the Biot-Savart backend ('numba', 'numpy' or 'gpu'), before any work is done.
+
+    Raises:
+        ValueError: If the backend is unknown.
+        ImportError: If the 'gpu' backend is requested and CuPy is not installed.
+    """
+    if backend not in ('numba', 'numpy', 'gpu'):
+        raise ValueError(f"Invalid backend. Expected 'numba', 'numpy' or 'gpu', got {backend}")
+    if backend == 'gpu' and cp is None:
+        raise ImportError("The 'gpu' backend requires CuPy to be installed")
+
+
+def _biot_savart(P, dl, mid, backend='numba'):
     """
-    Calculates the magnetic field at observation points P due to two square coils
+    Calculates the magnetic field at observation points P from the precomputed coil segments.
+
+    Parameters:
+        P (np.ndarray): Observation points (matrix of size m x 3).
+        dl, mid (np.ndarray): Segments of the coils, as returned by `_precompute_segments`.
+        backend (str): 'numba' to use the compiled multithreaded kernel, 'numpy' to use
+            the vectorized `calculate_field`, 'gpu' to run `calculate_field` on the GPU with CuPy.
+
+    Returns:
+        np.ndarray: Total magnetic field (B) calculated at each observation point P (matrix of size m x 3),
+            in the dtype of the segments.
+    """
+    _check_backend(backend)
+
+    # The points are computed in the precision of the segments
+    P = np.ascontiguousarray(P, dtype=dl.dtype)
+
+    if backend == 'numba':
+        return bsk.compute_field(P, mid, dl, np.empty((P.shape[0], 3), dtype=dl.dtype))
+    elif backend == 'gpu':
+        # Same tensor operation on the device, only the field is copied back to the host
+        xp, tile_pairs = cp, GPU_TILE_PAIRS
+        P, dl, mid = cp.asarray(P), cp.asarray(dl), cp.asarray(mid)
+    else:
+        xp, tile_pairs = np, TILE_PAIRS
+
+    # The observation points are computed in blocks, so the (points, coils, segments, 3) temporaries
+    # of each block stay in cache (or, on the GPU, in device memory) while the segments are reused
+    # by every block
+    B = xp.empty((P.shape[0], 3), dtype=dl.dtype)
+    tile = max(1, tile_pairs // (dl.shape[0] * dl.shape[1]))
+    for k in range(0, P.shape[0], tile):
+        B[k: k + tile] = calculate_field((P[k: k + tile], dl, mid))
+    return B if xp is np else cp.asnumpy(B)
+
+
+def magnetic_field_coil_parallel(P, N_arr, I, coils, n=None, backend='numba', dtype=np.float64):
+    """
+    Calculates the magnetic field at observation points P due to a set of coils
     using the Biot-Savart Law.
 
     Parameters:
         P (np.ndarray): Observation points where the magnetic field is calculated (matrix of size m x 3).
-        N (int): Number of turns in each coil.
+        N_arr (np.ndarray): Number of turns of each coil (size num_coils).
         I (float): Current flowing through each coil.
-        coils (np.ndarray): 3D coordinates of the coil segments (array of size num_seg x 3 x num_points).
-        n (int): Number of segments per coil to process simultaneously.
+        coils (np.ndarray): 3D coordinates of the coils (array of size num_coils x 3 x num_points).
+        n (int, optional): Unused, kept for backward compatibility.
+        backend (str): Biot-Savart implementation, 'numba' (default), 'numpy' or 'gpu'.
+        dtype (np.dtype): Precision of the computation, np.float64 (default) or np.float32.
 
     Returns:
         np.ndarray: Total magnetic field (B) calculated at each observation point P (matrix of size m x 3).
     """
     # Proportionality constant from the Biot-Savart Law
-    A1 = (N_arr * MU_0 * I) / (4 * np.pi)
-
-    # Use multiprocessing to calculate in parallel
-    with Pool(processes=cpu_count()) as pool:
-        B_segments = []  # List to store magnetic field results for each observation point
-        
-        # Iterate over each observation point in P
-        for i in range(P.shape[0]):  # P has m rows, each representing a point in space
-        
-            args = [(A1[j:j+n], P[i, :], coils[:, j:j+n]) for j in range(0, coils.shape[1], n)]
-
-            # Compute the magnetic field in parallel for coil segments
-            B_segments.append(pool.map(calculate_field, args))
-
-        # Sum contributions from all segments to get the total field at each point P
-        B_results = [np.sum(segments, axis=0) for segments in B_segments]
+    A1 = (np.asarray(N_arr, dtype=float) * MU_0 * I) / (4 * np.pi)
 
-    # Return results as a NumPy array
-    return np.array(B_results)
+    dl, mid = _precompute_segments(coils, A1, dtype)
+    return _biot_savart(P, dl, mid, backend)
 
-def coil_simulation_parallel(X, Y, Z, coil_params, spires_np, batch_size, enable_progress_bar=True, n=100):
+def coil_simulation_parallel(X, Y, Z, coil_params, spires_np, batch_size, enable_progress_bar=True, n=None,
+                             backend='numba', as_dataframe=True, dtype=None):
     """
         Simulates the magnetic field generated by two coils on a 1D grid in three orthogonal planes.
 
@@ -506,66 +711,63 @@ def coil_simulation_parallel(X, Y, Z, coil_params, spires_np, batch_size, enable
             X, Y, Z (np.ndarray): Arrays representing the coordinates of the grid points.
             coil_params (object): Parameters of the coils, including number of turns (N), and other coil properties.
             spires_np (np.ndarray): 3D coordinates of the coils (shape: num_segments x 3 x num_points).
-            batch_size (int): Number of points to process in each batch.
+            batch_size (int): Unused, kept for backward compatibility. All the points are computed
+                        in a single call of the Biot-Savart kernel.
             enable_progress_bar (bool): Whether to display a progress bar during simulation.
-            n (int): Additional parameter for the simulation (may relate to precision or integration steps).
+            n (int): Unused, kept for backward compatibility.
+            backend (str): Biot-Savart implementation, 'numba' (default), 'numpy' or 'gpu'.
+            as_dataframe (bool): If False, the results are returned as a dictionary of NumPy arrays,
+                        avoiding the DataFrame overhead on hot paths such as the optimizers.
+            dtype (np.dtype, optional): Precision of the field computation, np.float64 or np.float32,
+                        by default the dtype of `coil_params`. The float32 path halves the memory
+                        traffic of the kernel (relative error around 1e-6); the results are always
+                        returned in float64.
 
         Returns:
-            pd.DataFrame: A DataFrame containing the grid coordinates and magnetic field components.
+            pd.DataFrame or dict: The grid coordinates and magnetic field components.
                         Columns: ['X', 'Y', 'Z', 'Bx', 'By', 'Bz'].
         """
-    
-    # map the spides differential with number of turns
-    N_arr = np.repeat(coil_params.N, np.repeat(spires_np.shape[2], spires_np.shape[0]))
-
-    # Generate the X-Y grid based on the coil dimensions and grid step size    
-    result = []  # List to store the simulation results
-
-    #coils = np.concatenate(spires_np, axis=0)  # Merge along the first axis
-    coils = spires_np.transpose(1, 0, 2).reshape(3, -1)
-    
-    # Flatten X and Y arrays for easier iteration over the grid points
-    X_flat = X.flatten()
-    Y_flat = Y.flatten()
-    Z_flat = Z.flatten()
+    # Reject an invalid backend before computing the segments and opening the progress bar
+    _check_backend(backend)
 
     # Total number of grid points
-    num_points = len(X_flat)
-    
-    # Calculate the total number of iterations for progress tracking
-    num_iter = (num_points // batch_size) + (1 if num_points % batch_size != 0 else 0)
-
-    # Initialize the progress bar
-    progress_bar = tqdm(total=num_iter, desc="Simulation Progress", disable=not enable_progress_bar)
+    num_points = np.size(X)
 
-    # Iterate over the grid points in batches
-    for k in range(0, len(X_flat), batch_size):
-        X_batch = X_flat[k: k + batch_size]  # Batch of X coordinates
-        Y_batch = Y_flat[k: k + batch_size]  # Batch of Y coordinates
-        Z_batch = Z_flat[k: k + batch_size]  # Batch of Z coordinates
+    # Observation points as a single contiguous (num_points, 3) block, built once
+    P = np.empty((num_points, 3))
+    P[:, 0] = np.ravel(X)
+    P[:, 1] = np.ravel(Y)
+    P[:, 2] = np.ravel(Z)
 
-        # Generate 3D points for each batch in three orthogonal planes
-        P_batch = np.stack([X_batch, Y_batch, Z_batch], axis=1)
+    # Segments of the coils, computed once for all the grid points
+    dl, mid = coil_params.precompute_segments(spires_np, dtype)
+    dtype = dl.dtype
 
-        # Calculate the magnetic field at the batch points
-        B = magnetic_field_coil_parallel(P_batch, N_arr, coil_params.I, coils, n)
+    # Compile the kernel before starting, so the simulation does not account for it
+    if backend == 'numba':
+        bsk.warm_up(dtype)
 
-        # Store the results in the format (X, Y, Z, Bx, By, Bz)
-        result += list(zip(P_batch[:, 0], P_batch[:, 1], P_batch[:, 2], B[:, 0], B[:, 1], B[:, 2]))
-
-        # Update the progress bar
-        progress_bar.update(1)
+    # Initialize the progress bar
+    progress_bar = tqdm(total=1, desc="Simulation Progress", disable=not enable_progress_bar)
 
-    if progress_bar.n < progress_bar.total:
-        progress_bar.update(progress_bar.total - progress_bar.n)
+    # Calculate the magnetic field at all the grid points in a single call, the kernel
+    # handles the whole (num_points, 3) block at once
+    B = np.asarray(_biot_savart(P, dl, mid, backend), dtype=float)
 
     # Close the progress bar once the simulation is complete
+    progress_bar.update(1)
     progress_bar.close()
 
+    # Results in the format (X, Y, Z, Bx, By, Bz)
+    result = {'X': P[:, 0], 'Y': P[:, 1], 'Z': P[:, 2], 'Bx': B[:, 0], 'By': B[:, 1], 'Bz': B[:, 2]}
+    if not as_dataframe:
+        return result
+
     # Convert the results to a DataFrame for easier data manipulation and visualization
-    return pd.DataFrame(result, columns=['X', 'Y', 'Z', 'Bx', 'By', 'Bz'])
+    return pd.DataFrame(result)
 
-def coil_X_symmetric_simulation(X, Y, Z, coil_params, spires_np, batch_size, enable_progress_bar=True, n=100):
+def coil_X_symmetric_simulation(X, Y, Z, coil_params, spires_np, batch_size, enable_progress_bar=True, n=None,
+                                backend='numba', dtype=None):
     """
     Simulates a coil field while assuming symmetry over the X-axis.
 
@@ -573,9 +775,11 @@ def coil_X_symmetric_simulation(X, Y, Z, coil_params, spires_np, batch_size, ena
     - X, Y, Z: Arrays representing the spatial coordinates.
     - coil_params: Parameters of the coil.
     - spires_np: Number of spires.
-    - batch_size: Number of elements processed in parallel.
+    - batch_size: Unused, kept for backward compatibility.
     - enable_progress_bar: Boolean to show progress.
-    - n: Number of iterations.
+    - n: Unused, kept for backward compatibility.
+    - backend: Biot-Savart implementation, 'numba' (default), 'numpy' or 'gpu'.
+    - dtype: Precision of the field computation, np.float64 or np.float32, by default the dtype of coil_params.
 
     Returns:
     - A DataFrame with the original and symmetrically extended data.
@@ -600,7 +804,8 @@ def coil_X_symmetric_simulation(X, Y, Z, coil_params, spires_np, batch_size, ena
     #hplot.plot_grid(X_cropped, Y_cropped, Z_cropped, f0)
 
     # Run the simulation with the reduced dataset
-    result = coil_simulation_parallel(X_cropped, Y_cropped, Z_cropped, coil_params, spires_np, batch_size, enable_progress_bar, n)
+    result = coil_simulation_parallel(X_cropped, Y_cropped, Z_cropped, coil_params, spires_np, batch_size, enable_progress_bar, n,
+                                      backend=backend, dtype=dtype)
 
     # Ensure result is a DataFrame
     if not isinstance(result, pd.DataFrame):